@@ -5,17 +5,32 @@ FastAPI backend for 3D model generation using Microsoft TRELLIS
 """
 
 import os
-import urllib.request
+import asyncio
+import queue
+import fcntl
+import functools
+import hashlib
+import mimetypes
+import shutil
+import stat
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, Tuple, Dict
+from urllib.parse import quote
 
+import aiofiles
+import anyio
+import httpx
 from fastapi import FastAPI, HTTPException, File, UploadFile, Form, Body, Request
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
 from pydantic import BaseModel
-from PIL import Image
 import sys
 
 # Add TRELLIS to the path
@@ -23,6 +38,9 @@ sys.path.append("/home/farazfaruqi/trellis-physics")
 
 # Set environment variables for TRELLIS
 os.environ["SPCONV_ALGO"] = "native"
+# Configure the CUDA caching allocator once, before any backend module imports torch.
+# Expandable segments reduce fragmentation so resident pipelines don't force empty_cache churn.
+os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True")
 
 # Initialize session logger BEFORE other imports
 # Use BACKEND_SESSION_ID from env so one log file per backend run (reload workers append to it)
@@ -37,9 +55,9 @@ logger = get_logger()
 
 # Import our generation and optimization modules
 from image import generate_image
-from generate import generate_3d_from_image
+from generate import generate_3d_from_image, load_image_pipeline, PRECOMPRESSED_SUFFIXES
 from optimize import optimize_model
-from plot_stresses import plot_hexahedral_mesh_surface_stylized
+from generation_cache import GenerationCache, make_cache_key
 
 # Import segmentation module
 from segment import (
@@ -54,25 +72,222 @@ from segment import (
 app = FastAPI(
     title="InstructMesh-PhysiOpt-Integration API",
     description="Backend API for 3D model generation using Microsoft TRELLIS",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
+# Upload limits for the generate endpoints
+# Limit on the combined size of all images in one upload request
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_MB", "32")) * 1024 * 1024
+UPLOAD_LIMIT_DETAIL = f"Upload too large (limit {MAX_UPLOAD_BYTES // (1024 * 1024)} MB per request)."
+ALLOWED_IMAGE_TYPES = frozenset({"image/png", "image/jpeg", "image/webp", "image/gif"})
+UPLOAD_PATHS = frozenset({"/generate", "/generate_async"})
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject uploads whose declared Content-Length exceeds MAX_UPLOAD_BYTES with 413,
+    before the multipart body is received and spooled. Bodies without a (truthful)
+    Content-Length are still capped, on the combined file size, while saving (see _save_upload).
+    Added before CORSMiddleware so the 413 still carries CORS headers.
+    """
+    
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] in UPLOAD_PATHS:
+            length = Headers(scope=scope).get("content-length", "")
+            if length.isdigit() and int(length) > self.max_bytes:
+                response = ORJSONResponse(content={"detail": UPLOAD_LIMIT_DETAIL}, status_code=413)
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+app.add_middleware(UploadSizeLimitMiddleware, max_bytes=MAX_UPLOAD_BYTES)
+
 # Configure CORS
+# CORSMiddleware answers preflights itself and passes requests without an Origin
+# header straight through; a frozenset makes the per-request origin check O(1).
+# Override with a comma-separated ALLOWED_ORIGINS env var when serving the frontend elsewhere.
+ALLOWED_ORIGINS = frozenset(
+    origin.strip()
+    for origin in os.environ.get(
+        "ALLOWED_ORIGINS", "http://localhost:8080,http://127.0.0.1:8080"
+    ).split(",")
+    if origin.strip()
+)
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:8080", "http://127.0.0.1:8080"],
+    allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
+    expose_headers=["X-Num-Points", "X-Model-Id"],
+    max_age=86400,  # let browsers cache preflight responses for a day
 )
 
 # Directories setup
 BASE_DIR = Path(__file__).parent
 FILES_DIR = BASE_DIR.parent / "results" / "models"
 FILES_DIR.mkdir(parents=True, exist_ok=True)
+_FILES_PREFIX = str(FILES_DIR) + os.sep
+
+# Cache of previous generations, kept outside FILES_DIR so it isn't served statically
+generation_cache = GenerationCache(BASE_DIR.parent / "results" / "generation_cache.sqlite3")
+
+class APIGZipMiddleware(GZipMiddleware):
+    """GZip for API responses; /files serves precompressed siblings itself (see GeneratedFiles)."""
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith("/files/"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+# Level 5 keeps most of the size win on multi-MB /get_pointcloud JSON at a fraction of level 9's CPU
+app.add_middleware(APIGZipMiddleware, minimum_size=1024, compresslevel=5)
+
+
+# When set (e.g. "/_generated/"), /files responses carry an X-Accel-Redirect to this
+# nginx 'internal' location instead of a body, so nginx streams the file with sendfile.
+ACCEL_REDIRECT_PREFIX = os.environ.get("ACCEL_REDIRECT_PREFIX")
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows gzip (honouring q-values; 'gzip' overrides '*')."""
+    wildcard = False
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if coding not in ("gzip", "*"):
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding == "gzip":
+            return q > 0
+        wildcard = q > 0
+    return wildcard
+
+
+class GeneratedFiles(StaticFiles):
+    """
+    StaticFiles for generation outputs.
+    Optimization rewrites some outputs in place, so clients must revalidate;
+    StaticFiles' ETag/Last-Modified headers turn repeat views into cheap 304s.
+    Text-heavy meshes (.obj/.ply) are served from their '.gz' sibling when the
+    client accepts gzip (generate.py writes the siblings).
+    With ACCEL_REDIRECT_PREFIX set, the transfer is delegated to nginx instead.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._root = os.path.realpath(self.directory)
+    
+    async def get_response(self, path: str, scope):
+        if (
+            scope["method"] in ("GET", "HEAD")
+            and not ACCEL_REDIRECT_PREFIX
+            and path.endswith(PRECOMPRESSED_SUFFIXES)
+            and _accepts_gzip(Headers(scope=scope).get("accept-encoding", ""))
+        ):
+            try:
+                full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + ".gz")
+            except PermissionError:
+                raise HTTPException(status_code=401)
+            except OSError:
+                # Let the parent lookup of the plain file produce the error response
+                full_path, stat_result = "", None
+            if stat_result is not None and stat.S_ISREG(stat_result.st_mode):
+                response = self.file_response(full_path, stat_result, scope)
+                response.headers["Content-Type"] = mimetypes.guess_type(path)[0] or "text/plain"
+                response.headers["Content-Encoding"] = "gzip"
+                return response
+        return await super().get_response(path, scope)
+    
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        # Only reached for files lookup_path found under the root, so generation_id is a real folder
+        relative = os.path.relpath(full_path, self._root).replace(os.sep, "/")
+        generation_id, sep, _ = relative.partition("/")
+        if sep:
+            _touch_folder(generation_id)
+        if ACCEL_REDIRECT_PREFIX:
+            response = Response(
+                status_code=status_code,
+                media_type=mimetypes.guess_type(full_path)[0] or "text/plain",
+                headers={"X-Accel-Redirect": ACCEL_REDIRECT_PREFIX + quote(relative)},
+            )
+        else:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
 
-# Mount static files
-app.mount("/files", StaticFiles(directory=str(FILES_DIR)), name="files")
+
+# Mount static files (served with sendfile, Range and conditional GET support)
+app.mount("/files", GeneratedFiles(directory=str(FILES_DIR)), name="files")
+
+# Chunk size for streamed downloads and upload writes
+IO_CHUNK_SIZE = 1 << 20
+
+# Allowed GLB texture resolutions for /generate
+TEXTURE_SIZES = frozenset({512, 1024, 2048})
+
+# cache_key -> Future of the /generate run currently producing it (single-flight)
+_inflight_generations: Dict[str, asyncio.Future] = {}
+
+# /generate_async jobs (in-process; each uvicorn worker tracks its own)
+JOB_RETENTION = 3600  # seconds a finished job stays queryable
+_jobs: Dict[str, dict] = {}
+
+# Fire-and-forget tasks (async jobs, folder cleanup); referenced here until they finish
+_background_tasks: set = set()
+
+# Generation folders still being written by this worker; the stale-folder sweeper skips them
+_active_generation_ids: set = set()
+STALE_FOLDER_AGE = 3600  # seconds before a folder that never produced a model is swept
+SWEEP_INTERVAL = 300  # seconds between sweeps
+MODEL_SUFFIXES = (".glb", ".obj", ".ply")
+
+# Disk budget for FILES_DIR (MAX_RESULTS_GB; unset or 0 disables eviction). Over budget, the
+# least recently used generation folders are removed, skipping any used within EVICTION_GRACE.
+MAX_RESULTS_BYTES = int(float(os.environ.get("MAX_RESULTS_GB", "0")) * 2**30)
+EVICTION_GRACE = 3600  # seconds
+# generation_id -> last time this worker served or reused it (atime is unreliable under noatime)
+_folder_access: Dict[str, float] = {}
+
+# Shared HTTP client for fetching generated images (reuses connections across requests)
+http_client = httpx.AsyncClient(
+    headers={"User-Agent": "InstructMesh-Backend/1.0"},
+    timeout=httpx.Timeout(60.0, connect=10.0),
+    follow_redirects=True,
+)
+
+# Blocking GPU work (TRELLIS generation, physics optimization) runs off the event loop.
+# A thread pool keeps the cached pipelines in-process; CUDA kernels release the GIL.
+GPU_WORKERS = int(os.environ.get("GPU_WORKERS", "1"))
+gpu_executor = ThreadPoolExecutor(max_workers=GPU_WORKERS, thread_name_prefix="gpu")
+gpu_semaphore = asyncio.Semaphore(GPU_WORKERS)
+
+# Cross-process GPU slots: one lock file per slot, so uvicorn workers sharing the GPU run at
+# most GPU_WORKERS jobs in total while threads of one worker still run on separate slots
+GPU_LOCK_FILES = [BASE_DIR.parent / "results" / f".gpu.{slot}.lock" for slot in range(GPU_WORKERS)]
+_free_gpu_slots: queue.SimpleQueue = queue.SimpleQueue()
+for _slot in range(GPU_WORKERS):
+    _free_gpu_slots.put(_slot)
+
+# Point-SAM calls share module-level state in segment.py, so they run one at a time on
+# their own thread; interactive clicks don't queue behind a long generation.
+segment_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="segment")
 
 # ============================================================================
 # Helper Functions
@@ -90,6 +305,15 @@ def get_relative_url(file_path: Optional[str]) -> Optional[str]:
     """
     if not file_path:
         return None
+    return _relative_url_cached(str(file_path))
+
+
+@functools.lru_cache(maxsize=4096)
+def _relative_url_cached(file_path: str) -> Optional[str]:
+    """Resolve file_path to its '/files/...' URL (FILES_DIR is fixed, so results are cacheable)."""
+    # Fast path: paths under FILES_DIR map to a URL by plain string slicing
+    if file_path.startswith(_FILES_PREFIX):
+        return "/files/" + file_path[len(_FILES_PREFIX):].replace(os.sep, "/")
     
     try:
         # Convert to Path object
@@ -119,17 +343,249 @@ def get_relative_url(file_path: Optional[str]) -> Optional[str]:
         return None
 
 
-def _download_image(url: str, dest_dir: Path) -> Path:
+async def _download_image(url: str, dest_dir: Path) -> Path:
     """Download image from URL to dest_dir; return path to saved file."""
-    req = urllib.request.Request(url, headers={"User-Agent": "InstructMesh-Backend/1.0"})
-    with urllib.request.urlopen(req) as resp:
+    async with http_client.stream("GET", url) as resp:
+        resp.raise_for_status()
         ct = (resp.headers.get("Content-Type") or "").lower()
         ext = ".jpg" if "jpeg" in ct or "jpg" in ct else ".png"
         path = dest_dir / f"generated_image{ext}"
-        with open(path, "wb") as f:
-            f.write(resp.read())
+        async with aiofiles.open(path, "wb") as f:
+            async for chunk in resp.aiter_bytes(IO_CHUNK_SIZE):
+                await f.write(chunk)
     return path
 
+
+def _create_generation_folder() -> Tuple[str, Path]:
+    """
+    Create a fresh output folder for a generation.
+    
+    Returns:
+        Tuple of (generation_id, folder path). The ID is a timestamp plus a random
+        suffix; mkdir(exist_ok=False) is the atomic guard against collisions.
+    """
+    base_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+    for _ in range(2):
+        generation_id = f"{base_id}_{uuid.uuid4().hex[:6]}"
+        output_folder = FILES_DIR / generation_id
+        try:
+            output_folder.mkdir(parents=True, exist_ok=False)
+            _active_generation_ids.add(generation_id)
+            return generation_id, output_folder
+        except FileExistsError:
+            continue
+    raise RuntimeError("Could not allocate a unique generation folder")
+
+
+def _touch_folder(generation_id: str) -> None:
+    """Record a use of a generation folder for LRU eviction."""
+    if MAX_RESULTS_BYTES:
+        _folder_access[generation_id] = time.time()
+
+
+def _spawn_background(coro) -> asyncio.Task:
+    """Start coro as a task that is kept referenced until it completes."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+def _discard_folder(folder: Path) -> None:
+    """Remove folder in a worker thread without making the current request wait for it."""
+    _spawn_background(asyncio.to_thread(shutil.rmtree, folder, True))
+
+
+def _sweep_stale_folders(active_ids: frozenset) -> int:
+    """
+    Remove generation folders that are older than STALE_FOLDER_AGE and never produced a
+    model (failed or abandoned runs). Folders in active_ids are skipped.
+    
+    Returns:
+        Number of folders removed
+    """
+    cutoff = time.time() - STALE_FOLDER_AGE
+    removed = 0
+    with os.scandir(FILES_DIR) as entries:
+        for entry in entries:
+            if entry.name in active_ids or not entry.is_dir():
+                continue
+            try:
+                if entry.stat().st_mtime > cutoff:
+                    continue
+                with os.scandir(entry.path) as files:
+                    if any(f.name.endswith(MODEL_SUFFIXES) for f in files):
+                        continue
+            except FileNotFoundError:
+                continue
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+def _folder_size(path: str) -> int:
+    """Total size in bytes of the regular files under path."""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+
+def _evict_over_budget(active_ids: frozenset, accessed: Dict[str, float]) -> List[str]:
+    """
+    Remove least recently used generation folders until FILES_DIR fits in MAX_RESULTS_BYTES.
+    A folder's last use is the later of its mtime and its entry in accessed. Folders in
+    active_ids or used within EVICTION_GRACE are never removed.
+    
+    Returns:
+        Generation IDs of the removed folders
+    """
+    folders = []
+    total = 0
+    with os.scandir(FILES_DIR) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            try:
+                last_used = max(entry.stat().st_mtime, accessed.get(entry.name, 0.0))
+            except FileNotFoundError:
+                continue
+            size = _folder_size(entry.path)
+            total += size
+            folders.append((last_used, entry.name, entry.path, size))
+    
+    cutoff = time.time() - EVICTION_GRACE
+    removed = []
+    for last_used, name, path, size in sorted(folders):
+        if total <= MAX_RESULTS_BYTES or last_used > cutoff:
+            break
+        if name in active_ids:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        removed.append(name)
+    if total > MAX_RESULTS_BYTES:
+        logger.warning(
+            "Generation outputs use %.1f GB, over the %.1f GB budget, but the rest is in use",
+            total / 2**30, MAX_RESULTS_BYTES / 2**30,
+        )
+    return removed
+
+
+async def _sweep_loop() -> None:
+    """Periodically sweep stale generation folders (and evict over budget) off the request path."""
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL)
+        try:
+            active_ids = frozenset(_active_generation_ids)
+            removed = await asyncio.to_thread(_sweep_stale_folders, active_ids)
+            if removed:
+                logger.info("Removed %d stale generation folder(s)", removed)
+            if MAX_RESULTS_BYTES:
+                evicted = await asyncio.to_thread(_evict_over_budget, active_ids, dict(_folder_access))
+                if evicted:
+                    logger.info("Evicted %d least recently used generation folder(s)", len(evicted))
+                # Forget folders that are gone (evicted, swept, or never existed, e.g. 404 paths)
+                gone = await asyncio.to_thread(
+                    lambda ids: [g for g in ids if not os.path.isdir(FILES_DIR / g)], list(_folder_access)
+                )
+                for generation_id in gone:
+                    _folder_access.pop(generation_id, None)
+        except Exception:
+            logger.exception("Stale folder sweep failed")
+
+
+def _list_filenames(folder: Path) -> set:
+    """Return the names of regular files in folder using a single scandir pass."""
+    with os.scandir(folder) as entries:
+        return {entry.name for entry in entries if entry.is_file()}
+
+
+def _save_upload(src, path: Path, budget: int) -> Tuple[str, int]:
+    """
+    Copy an upload's spooled file to path in fixed-size chunks.
+    
+    Args:
+        src: File object backing the UploadFile
+        path: Destination path
+        budget: Bytes this file may use (what is left of MAX_UPLOAD_BYTES for the request)
+        
+    Returns:
+        Tuple of (hex SHA-256 digest, number of bytes copied)
+        
+    Raises:
+        HTTPException: 413 once more than budget bytes have been copied
+    """
+    digest = hashlib.sha256()
+    total = 0
+    src.seek(0)
+    with open(path, "wb") as f:
+        while chunk := src.read(IO_CHUNK_SIZE):
+            total += len(chunk)
+            if total > budget:
+                raise HTTPException(status_code=413, detail=UPLOAD_LIMIT_DETAIL)
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest(), total
+
+
+def _quick_validate_image(path: Path) -> bool:
+    """
+    Check the file's magic bytes for a supported image format (JPEG, PNG, GIF, WebP).
+    Only the first 16 bytes are read, so no pixel data is decoded.
+    """
+    with open(path, "rb") as f:
+        header = f.read(16)
+    return (
+        header.startswith(b"\xff\xd8\xff")
+        or header.startswith(b"\x89PNG\r\n\x1a\n")
+        or header.startswith(b"GIF8")
+        or (header[:4] == b"RIFF" and header[8:12] == b"WEBP")
+    )
+
+
+async def run_on_gpu(func, *args, **kwargs):
+    """
+    Run a blocking GPU-bound function in the GPU executor without blocking the event loop.
+    
+    Args:
+        func: Callable to run
+        *args, **kwargs: Arguments forwarded to func
+        
+    Returns:
+        Whatever func returns
+    """
+    loop = asyncio.get_running_loop()
+    async with gpu_semaphore:
+        return await loop.run_in_executor(gpu_executor, functools.partial(_with_gpu_lock, func, *args, **kwargs))
+
+
+def _with_gpu_lock(func, *args, **kwargs):
+    """
+    Call func while holding one of the GPU slot locks shared by all backend worker processes.
+    gpu_semaphore bounds callers to GPU_WORKERS, so a free in-process slot is always available.
+    """
+    slot = _free_gpu_slots.get()
+    try:
+        with open(GPU_LOCK_FILES[slot], "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    finally:
+        _free_gpu_slots.put(slot)
+
+
+async def run_segmentation(func, *args, **kwargs):
+    """Run a blocking segmentation function on the segmentation thread."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(segment_executor, functools.partial(func, *args, **kwargs))
+
 # ============================================================================
 # Request/Response Models
 # ============================================================================
@@ -157,7 +613,9 @@ async def root():
         "endpoints": {
             "health": "/health",
             "docs": "/docs",
-            "generate": "/generate (POST)"
+            "generate": "/generate (POST)",
+            "generate_async": "/generate_async (POST, 202 + job polling)",
+            "jobs": "/jobs/{job_id}"
         },
         "documentation": "Visit http://localhost:8000/docs for interactive API documentation"
     }
@@ -172,143 +630,317 @@ async def health_check():
         version="1.0.0"
     )
 
-@app.post("/generate")
-async def generate(
-    text: Optional[str] = Form(None),
-    images: Optional[List[UploadFile]] = File(None),
-    seed: int = Form(1),
-):
-    """
-    Single generate endpoint: text required, images optional. Generates an image via image.py,
-    then runs 3D generation (generate.py) on the resulting image.
-    """
-    imgs = images or []
-    prompt = (text or "").strip()
+async def _generate_uncached(
+    prompt: str,
+    image_input_paths: List[str],
+    generation_id: str,
+    output_folder: Path,
+    seed: int,
+    texture_size: int,
+    cache_key: str,
+) -> dict:
+    """Run image generation and TRELLIS for a cache miss; store and return the response data"""
+    logger.info("Generating image via image.py (prompt=%s, %d images)", prompt, len(image_input_paths))
+
+    # 1. Generate image with image.py (Fal.ai)
+    # image.py will handle uploading local paths to Fal CDN if needed
+    generated_image_url = await generate_image(prompt, image_input_paths)
+    logger.info("✓ Image generated!")
+
+    # 2. Download result and run 3D generation with generate.py
+    downloaded_path = await _download_image(generated_image_url, output_folder)
+    logger.info("Starting 3D generation on %s", downloaded_path)
+
+    results = await run_on_gpu(
+        generate_3d_from_image,
+        image_path=str(downloaded_path),
+        output_folder=str(output_folder),
+        seed=seed,
+        num_samples=1,
+        texture_size=texture_size,
+    )
+
+    if not results.get("success"):
+        raise HTTPException(
+            status_code=500,
+            detail=results.get("error", "3D generation failed."),
+        )
+
+    model_path = results.get("glb_path") or results.get("obj_path")
+    if not model_path:
+        raise HTTPException(status_code=500, detail="No model file was generated.")
+
+    response_data = {
+        "success": True,
+        "generation_id": generation_id,
+        "model_url": get_relative_url(model_path),
+        "files": {
+            "glb": get_relative_url(results.get("glb_path")),
+            "obj": get_relative_url(results.get("obj_path")),
+            "ply": get_relative_url(results.get("ply_path")),
+            "slat": get_relative_url(results.get("slat_path")),
+        },
+    }
+    await asyncio.to_thread(generation_cache.put, cache_key, generation_id, response_data)
+    return response_data
+
+def _validate_generate_params(prompt: str, texture_size: int) -> None:
+    """Raise HTTPException(400) for a missing prompt or an unsupported texture size"""
     if not prompt:
         raise HTTPException(
             status_code=400,
             detail="Text (prompt) is required.",
         )
+    if texture_size not in TEXTURE_SIZES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"texture_size must be one of {sorted(TEXTURE_SIZES)}.",
+        )
 
-    try:
-        base_id = datetime.now().strftime("%Y%m%d_%H%M%S")
-        generation_id = base_id
-        n = 0
-        while (FILES_DIR / generation_id).exists():
-            n += 1
-            generation_id = f"{base_id}_{n}"
-        output_folder = FILES_DIR / generation_id
-        output_folder.mkdir(parents=True, exist_ok=True)
 
-        # Save uploaded images and pass local paths to image.py
-        # image.py will upload them to Fal CDN if needed (for public URLs)
-        image_input_paths: List[str] = []
+async def _save_generation_inputs(imgs: List[UploadFile], output_folder: Path) -> Tuple[List[str], List[str]]:
+    """
+    Save uploaded images into the generation folder.
+    
+    Returns:
+        Tuple of (saved paths, hex SHA-256 digests), in upload order
+    """
+    # Save uploaded images and pass local paths to image.py
+    # image.py will upload them to Fal CDN if needed (for public URLs)
+    # Check every declared type before copying anything
+    for uf in imgs:
+        if uf.content_type not in ALLOWED_IMAGE_TYPES:
+            _discard_folder(output_folder)
+            raise HTTPException(
+                status_code=415,
+                detail=f"Unsupported upload type {uf.content_type!r}; expected one of {sorted(ALLOWED_IMAGE_TYPES)}.",
+            )
+    
+    image_input_paths: List[str] = []
+    image_digests: List[str] = []
+    budget = MAX_UPLOAD_BYTES
+    try:
         for i, uf in enumerate(imgs):
-            if not uf.content_type or not uf.content_type.startswith("image/"):
-                raise HTTPException(status_code=400, detail="All uploads must be images.")
             ext = Path(uf.filename or "image").suffix or ".png"
             name = f"input_{i}{ext}"
             path = output_folder / name
-            with open(path, "wb") as f:
-                f.write(await uf.read())
-            try:
-                Image.open(path).verify()
-            except Exception:
+            digest, size = await asyncio.to_thread(_save_upload, uf.file, path, budget)
+            budget -= size
+            if not _quick_validate_image(path):
                 raise HTTPException(status_code=400, detail=f"Invalid image: {uf.filename}")
             image_input_paths.append(str(path))
+            image_digests.append(digest)
+    except HTTPException:
+        _discard_folder(output_folder)
+        raise
+    return image_input_paths, image_digests
 
-        logger.info("Generating image via image.py (prompt=%s, %d images)", prompt, len(image_input_paths))
 
-        # 1. Generate image with image.py (Fal.ai)
-        # image.py will handle uploading local paths to Fal CDN if needed
-        generated_image_url = generate_image(prompt, image_input_paths)
-        logger.info("✓ Image generated!")
+async def _resolve_generation(
+    prompt: str,
+    seed: int,
+    texture_size: int,
+    image_input_paths: List[str],
+    image_digests: List[str],
+    generation_id: str,
+    output_folder: Path,
+) -> dict:
+    """
+    Produce the /generate response content: from the cache, by joining an identical
+    in-flight run, or by running the generation (single-flight per cache key).
+    """
+    # Identical inputs (prompt, seed, image bytes) reuse the previous generation
+    cache_key = make_cache_key(prompt, seed, image_digests, texture_size)
+    cached = await asyncio.to_thread(generation_cache.get, cache_key)
+    if cached is not None:
+        if (FILES_DIR / cached["generation_id"]).is_dir():
+            logger.info("Cache hit for generation %s", cached["generation_id"])
+            _touch_folder(cached["generation_id"])
+            _discard_folder(output_folder)
+            return {**cached["response"], "cached": True, "cache_key": cache_key}
+        await asyncio.to_thread(generation_cache.delete, cache_key)
 
-        # 2. Download result and run 3D generation with generate.py
-        downloaded_path = _download_image(generated_image_url, output_folder)
-        logger.info("Starting 3D generation on %s", downloaded_path)
+    # Identical requests that are already running share that run's result
+    inflight = _inflight_generations.get(cache_key)
+    if inflight is not None:
+        logger.info("Joining in-flight generation for %s", cache_key)
+        _discard_folder(output_folder)
+        response_data = await asyncio.shield(inflight)
+        return {**response_data, "cached": True, "cache_key": cache_key}
 
-        results = generate_3d_from_image(
-            image_path=str(downloaded_path),
-            output_folder=str(output_folder),
-            seed=seed,
-            num_samples=1,
+    future = asyncio.get_running_loop().create_future()
+    _inflight_generations[cache_key] = future
+    try:
+        response_data = await _generate_uncached(
+            prompt, image_input_paths, generation_id, output_folder, seed, texture_size, cache_key
         )
+    except BaseException as e:
+        # Waiters were not cancelled themselves, so they get an error response instead
+        if isinstance(e, asyncio.CancelledError):
+            e = HTTPException(status_code=503, detail="Generation was cancelled")
+        future.set_exception(e)
+        future.exception()  # mark retrieved; waiters (if any) re-raise it
+        raise
+    else:
+        future.set_result(response_data)
+    finally:
+        _inflight_generations.pop(cache_key, None)
+    return {**response_data, "cached": False, "cache_key": cache_key}
 
-        if not results.get("success"):
-            raise HTTPException(
-                status_code=500,
-                detail=results.get("error", "3D generation failed."),
-            )
-
-        model_path = results.get("glb_path") or results.get("obj_path")
-        if not model_path:
-            raise HTTPException(status_code=500, detail="No model file was generated.")
+@app.post("/generate")
+async def generate(
+    text: Optional[str] = Form(None),
+    images: Optional[List[UploadFile]] = File(None),
+    seed: int = Form(1),
+    texture_size: int = Form(1024),
+):
+    """
+    Single generate endpoint: text required, images optional. Generates an image via image.py,
+    then runs 3D generation (generate.py) on the resulting image.
+    texture_size sets the GLB texture resolution; 512 roughly halves texture baking time.
+    """
+    imgs = images or []
+    prompt = (text or "").strip()
+    _validate_generate_params(prompt, texture_size)
 
-        response_data = {
-            "success": True,
-            "generation_id": generation_id,
-            "model_url": get_relative_url(model_path),
-            "files": {
-                "glb": get_relative_url(results.get("glb_path")),
-                "obj": get_relative_url(results.get("obj_path")),
-                "ply": get_relative_url(results.get("ply_path")),
-                "slat": get_relative_url(results.get("slat_path")),
-            },
-        }
-        return JSONResponse(content=response_data)
+    generation_id = None
+    try:
+        generation_id, output_folder = _create_generation_folder()
+        image_input_paths, image_digests = await _save_generation_inputs(imgs, output_folder)
+        content = await _resolve_generation(
+            prompt, seed, texture_size, image_input_paths, image_digests, generation_id, output_folder
+        )
+        return ORJSONResponse(content=content)
 
     except HTTPException:
         raise
     except Exception as e:
         logger.exception("Generate failed")
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
+    finally:
+        _active_generation_ids.discard(generation_id)
+
+@app.post("/generate_async", status_code=202)
+async def generate_async(
+    text: Optional[str] = Form(None),
+    images: Optional[List[UploadFile]] = File(None),
+    seed: int = Form(1),
+    texture_size: int = Form(1024),
+):
+    """
+    Same inputs as /generate, but answers 202 Accepted as soon as the uploads are saved.
+    Poll GET /jobs/{job_id} for the status; once 'completed', 'result' holds the /generate response.
+    Jobs live in this worker's memory for JOB_RETENTION seconds after they finish.
+    """
+    imgs = images or []
+    prompt = (text or "").strip()
+    _validate_generate_params(prompt, texture_size)
+
+    generation_id = None
+    try:
+        generation_id, output_folder = _create_generation_folder()
+        image_input_paths, image_digests = await _save_generation_inputs(imgs, output_folder)
+    except HTTPException:
+        _active_generation_ids.discard(generation_id)
+        raise
+    except Exception as e:
+        _active_generation_ids.discard(generation_id)
+        logger.exception("Generate (async) failed")
+        raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
+
+    _prune_jobs()
+    job_id = uuid.uuid4().hex
+    job = {"job_id": job_id, "status": "pending", "created": time.time()}
+    _jobs[job_id] = job
+
+    _spawn_background(_run_generation_job(
+        job, generation_id,
+        (prompt, seed, texture_size, image_input_paths, image_digests, generation_id, output_folder),
+    ))
+
+    return ORJSONResponse(
+        status_code=202,
+        content={"job_id": job_id, "status": "pending", "status_url": f"/jobs/{job_id}"},
+    )
+
+async def _run_generation_job(job: dict, generation_id: str, resolve_args: tuple) -> None:
+    """Run _resolve_generation(*resolve_args) for a /generate_async job and record the outcome on the job"""
+    job["status"] = "running"
+    try:
+        job["result"] = await _resolve_generation(*resolve_args)
+        job["status"] = "completed"
+    except HTTPException as e:
+        job.update(status="failed", error=e.detail, status_code=e.status_code)
+    except Exception as e:
+        logger.exception("Generation job %s failed", job["job_id"])
+        job.update(status="failed", error=f"Generation failed: {str(e)}", status_code=500)
+    except asyncio.CancelledError:
+        logger.warning("Generation job %s was cancelled", job["job_id"])
+        job.update(status="failed", error="Generation was cancelled", status_code=503)
+        raise
+    finally:
+        _active_generation_ids.discard(generation_id)
+        job["finished"] = time.time()
+
+def _prune_jobs() -> None:
+    """Drop finished jobs older than JOB_RETENTION seconds"""
+    cutoff = time.time() - JOB_RETENTION
+    for job_id in [jid for jid, job in _jobs.items() if job.get("finished", float("inf")) < cutoff]:
+        del _jobs[job_id]
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a /generate_async job: pending, running, completed (with 'result') or failed (with 'error')"""
+    job = _jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return ORJSONResponse(content=job)
 
 @app.post("/optimize/{generation_id}")
 async def optimize_3d_model(generation_id: str):
     """Optimize a generated 3D model using physics simulation"""
     
-    logger.info(f"Optimization request for generation: {generation_id}")
+    logger.info("Optimization request for generation: %s", generation_id)
     
     try:
         # Get the folder path for this generation
         folder_path = FILES_DIR / generation_id
         
         if not folder_path.exists():
-            logger.warning(f"Generation folder not found: {generation_id}")
+            logger.warning("Generation folder not found: %s", generation_id)
             raise HTTPException(status_code=404, detail=f"Generation folder not found: {generation_id}")
         
         # Check if SLAT file exists (required for optimization)
         slat_file = folder_path / "slat_00.pt"
         if not slat_file.exists():
-            logger.warning(f"SLAT file not found for generation: {generation_id}")
+            logger.warning("SLAT file not found for generation: %s", generation_id)
             raise HTTPException(
                 status_code=400, 
                 detail=f"SLAT file not found. Optimization requires a SLAT file (slat_00.pt) in the generation folder."
             )
         
         # Run optimization
-        logger.info(f"Starting physics optimization for: {generation_id}")
-        results = optimize_model(
+        logger.info("Starting physics optimization for: %s", generation_id)
+        _touch_folder(generation_id)
+        results = await run_on_gpu(
+            optimize_model,
             folder_path=str(folder_path),
             save_slat=False
         )
         
         if not results.get("success"):
             error_msg = results.get("error", "Unknown error occurred")
-            logger.error(f"Optimization failed: {error_msg}")
+            logger.error("Optimization failed: %s", error_msg)
             raise HTTPException(status_code=500, detail=f"Optimization failed: {error_msg}")
         
-        # Prepare response
+        # Prepare response (one directory listing instead of a stat per artifact)
+        output_names = _list_filenames(folder_path)
         optimized_glb_path = results.get("optimized_glb_path")
-        if not optimized_glb_path or not Path(optimized_glb_path).exists():
+        if not optimized_glb_path or Path(optimized_glb_path).name not in output_names:
             logger.error("Optimized GLB file was not created")
             raise HTTPException(status_code=500, detail="Optimized GLB file was not created")
         
-        logger.info(f"Optimization successful for: {generation_id}")
-        
-        stresses_path = folder_path / "stresses.png"
-        stresses_opt_path = folder_path / "stresses_optimized.png"
+        logger.info("Optimization successful for: %s", generation_id)
         
         response_data = {
             "success": True,
@@ -316,29 +948,19 @@ async def optimize_3d_model(generation_id: str):
             "optimized_model_url": get_relative_url(optimized_glb_path),
             "message": results.get("message", "Optimization completed successfully")
         }
-        if stresses_path.exists():
-            response_data["stresses_url"] = get_relative_url(str(stresses_path))
-        if stresses_opt_path.exists():
-            response_data["stresses_optimized_url"] = get_relative_url(str(stresses_opt_path))
+        if "stresses.png" in output_names:
+            response_data["stresses_url"] = get_relative_url(str(folder_path / "stresses.png"))
+        if "stresses_optimized.png" in output_names:
+            response_data["stresses_optimized_url"] = get_relative_url(str(folder_path / "stresses_optimized.png"))
         
-        return JSONResponse(content=response_data)
+        return ORJSONResponse(content=response_data)
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Optimization exception: {str(e)}", exc_info=True)
+        logger.error("Optimization exception: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Optimization failed: {str(e)}")
 
-@app.get("/files/{folder}/{filename}")
-async def serve_file(folder: str, filename: str):
-    """Serve generated files"""
-    file_path = FILES_DIR / folder / filename
-    
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="File not found")
-    
-    return FileResponse(file_path)
-
 # ============================================================================
 # 3D Segmentation Endpoints
 # ============================================================================
@@ -350,7 +972,7 @@ class Load3DModelRequest(BaseModel):
 async def load_3d_model_endpoint(request: Load3DModelRequest):
     """Load a 3D model and prepare it for Point-SAM segmentation"""
     if not POINT_SAM_AVAILABLE:
-        return JSONResponse(
+        return ORJSONResponse(
             content={"success": False, "error": "Point-SAM not available"}, 
             status_code=503
         )
@@ -359,19 +981,19 @@ async def load_3d_model_endpoint(request: Load3DModelRequest):
         model_id = request.model_id
         model_dir = FILES_DIR / model_id
         if not model_dir.exists():
-            return JSONResponse(
+            return ORJSONResponse(
                 content={"success": False, "error": f"Model {model_id} not found"}, 
                 status_code=200
             )
         
-        model_data, error = load_model_for_segmentation(model_id, FILES_DIR)
+        model_data, error = await run_segmentation(load_model_for_segmentation, model_id, FILES_DIR)
         if error:
-            return JSONResponse(
+            return ORJSONResponse(
                 content={"success": False, "error": error}, 
                 status_code=200
             )
         
-        return JSONResponse(content={
+        return ORJSONResponse(content={
             "success": True, 
             "model_id": model_id,
             "num_points": int(model_data['pc_xyz'].shape[1]),
@@ -379,7 +1001,7 @@ async def load_3d_model_endpoint(request: Load3DModelRequest):
         })
         
     except Exception as e:
-        return JSONResponse(
+        return ORJSONResponse(
             content={"success": False, "error": str(e)},
             status_code=500
         )
@@ -390,44 +1012,91 @@ async def clear_3d_prompts():
     from segment import current_ply_data
     
     if current_ply_data is None:
-        return JSONResponse(
+        return ORJSONResponse(
             content={"success": False, "error": "No 3D model loaded"}, 
             status_code=400
         )
     
-    clear_prompts()
-    return JSONResponse(content={"success": True, "message": "Prompts cleared"})
+    await run_segmentation(clear_prompts)
+    return ORJSONResponse(content={"success": True, "message": "Prompts cleared"})
 
 @app.get("/get_pointcloud")
-async def get_pointcloud():
-    """Get the currently loaded point cloud data for Three.js visualization"""
-    data, error = get_pointcloud_data()
+async def get_pointcloud(request: Request):
+    """
+    Get the currently loaded point cloud data for Three.js visualization.
+    
+    With 'Accept: application/octet-stream' the body is raw little-endian float32:
+    N*3 interleaved xyz values followed by N*3 interleaved rgb values. The point
+    count and model ID are returned in the X-Num-Points / X-Model-Id headers.
+    """
+    data, error = await run_segmentation(get_pointcloud_data)
     if error:
-        return JSONResponse(
+        return ORJSONResponse(
             content={"success": False, "error": error}, 
             status_code=400
         )
     
-    return JSONResponse(content={"success": True, **data})
+    if "application/octet-stream" in request.headers.get("accept", ""):
+        body = data["xyz"].astype("<f4", copy=False).tobytes() + data["rgb"].astype("<f4", copy=False).tobytes()
+        return Response(
+            content=body,
+            media_type="application/octet-stream",
+            headers={
+                "X-Num-Points": str(data["num_points"]),
+                "X-Model-Id": str(data["model_id"]),
+            },
+        )
+    
+    return ORJSONResponse(content={"success": True, **data})
 
 @app.post("/segment_3d_model")
 async def segment_3d_model_endpoint(click_point: dict = Body(...)):
     """Segment a 3D model using Point-SAM with click point (positive/negative prompt)"""
     if not POINT_SAM_AVAILABLE:
-        return JSONResponse(
+        return ORJSONResponse(
             content={"success": False, "error": "Point-SAM not available"}, 
             status_code=503
         )
     
-    result, error = segment_with_click(click_point)
+    result, error = await run_segmentation(segment_with_click, click_point)
     if error:
         status_code = 400 if "too small" in error else 500
-        return JSONResponse(
+        return ORJSONResponse(
             content={"success": False, "error": error}, 
             status_code=status_code
         )
     
-    return JSONResponse(content={"success": True, **result})
+    return ORJSONResponse(content={"success": True, **result})
+
+# ============================================================================
+# Lifecycle
+# ============================================================================
+
+@app.on_event("startup")
+async def preload_pipelines():
+    """Load the image-to-3D pipeline before serving so the first /generate doesn't pay for it"""
+    if os.environ.get("PRELOAD_PIPELINES", "1") != "1":
+        return
+    logger.info("Preloading TRELLIS image-to-3D pipeline...")
+    try:
+        await run_on_gpu(load_image_pipeline)
+    except Exception:
+        logger.exception("Pipeline preload failed; it will be loaded on first request")
+
+@app.on_event("startup")
+async def start_folder_sweeper():
+    """Start the periodic sweep of abandoned generation folders"""
+    _spawn_background(_sweep_loop())
+
+@app.on_event("shutdown")
+async def shutdown_resources():
+    """Stop background tasks; close the shared HTTP client, executors and generation cache"""
+    for task in list(_background_tasks):
+        task.cancel()
+    await http_client.aclose()
+    gpu_executor.shutdown(wait=False)
+    segment_executor.shutdown(wait=False)
+    generation_cache.close()
 
 # ============================================================================
 # Startup Message
@@ -440,7 +1109,7 @@ if __name__ == "__main__":
     logger.info("Starting InstructMesh-PhysiOpt-Integration Backend...")
     logger.info("Backend will be available at: http://localhost:8000")
     logger.info("API documentation at: http://localhost:8000/docs")
-    logger.info(f"Session log file: {logger_instance.get_log_path()}")
+    logger.info("Session log file: %s", logger_instance.get_log_path())
     
     # Register cleanup on exit
     def cleanup_logger():
@@ -449,18 +1118,26 @@ if __name__ == "__main__":
     atexit.register(cleanup_logger)
     
     try:
+        # DEV=1 enables auto-reload (single process); otherwise run WEB_CONCURRENCY workers.
+        # Each worker loads its own models and segmentation state, so keep 1 per GPU.
+        # LIMIT_CONCURRENCY caps open connections per worker; excess requests get a 503.
+        limit_concurrency = os.environ.get("LIMIT_CONCURRENCY")
         uvicorn.run(
             "app:app",
             host="0.0.0.0",
             port=8000,
-            reload=True,
+            reload=os.environ.get("DEV") == "1",
+            workers=int(os.environ.get("WEB_CONCURRENCY", "1")),
+            loop="uvloop",
+            http="httptools",
+            limit_concurrency=int(limit_concurrency) if limit_concurrency else None,
             log_level="info"
         )
     except KeyboardInterrupt:
         logger.info("Server stopped by user")
         cleanup_logger()
     except Exception as e:
-        logger.error(f"Server error: {e}")
+        logger.error("Server error: %s", e)
         cleanup_logger()
         raise
 
@@ -7,7 +7,9 @@ Based on trellis-physics-studio/source/sample.py structure
 
 import os
 import sys
+import gzip
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, Any, Optional
 
@@ -32,13 +34,50 @@ from trellis.modules.sparse.basic import save_slat_conds
 from trellis.utils.phys_utils import *
 from trellis.utils import postprocessing_utils
 
+# Let cuDNN pick the fastest dense-conv kernels once per input shape (shapes are fixed per pipeline)
+torch.backends.cudnn.benchmark = True
+# Allow TF32 tensor cores for the matmuls that stay in FP32 (the flow transformers already run in FP16)
+torch.set_float32_matmul_precision("high")
+
 # Global pipeline cache
 _text_pipeline = None
 _image_pipeline = None
 
+# Pipelines moved to host memory by clear_pipeline_cache; moved back with .cuda() instead of reloading weights
+_offloaded_pipelines: Dict[str, Any] = {}
+
+# Background thread pool for output file writes and post-processing (e.g. gzip siblings)
+io_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="generate-io")
+
+# Outputs that get a precompressed '.gz' sibling for serving with Content-Encoding: gzip
+PRECOMPRESSED_SUFFIXES = (".obj", ".ply")
+
+
+def write_gzip_sibling(path: str) -> str:
+    """
+    Write path + '.gz' with fast (level 1) compression.
+    The file is written under a temporary name and renamed so it is never served half-written.
+    
+    Args:
+        path: File to compress
+    
+    Returns:
+        Path to the compressed sibling
+    """
+    gz_path = path + ".gz"
+    tmp_path = gz_path + ".tmp"
+    with open(path, "rb") as src, gzip.open(tmp_path, "wb", compresslevel=1) as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+    os.replace(tmp_path, gz_path)
+    return gz_path
+
 def load_text_pipeline():
     """Load and cache the text-to-3D pipeline"""
     global _text_pipeline
+    if _text_pipeline is None and "text" in _offloaded_pipelines:
+        print("Restoring TRELLIS text-to-3D pipeline to GPU...")
+        _text_pipeline = _offloaded_pipelines.pop("text")
+        _text_pipeline.cuda()
     if _text_pipeline is None:
         print("Loading TRELLIS text-to-3D pipeline...")
         _text_pipeline = TrellisTextTo3DPipeline.from_pretrained(
@@ -52,6 +91,10 @@ def load_text_pipeline():
 def load_image_pipeline():
     """Load and cache the image-to-3D pipeline"""
     global _image_pipeline
+    if _image_pipeline is None and "image" in _offloaded_pipelines:
+        print("Restoring TRELLIS image-to-3D pipeline to GPU...")
+        _image_pipeline = _offloaded_pipelines.pop("image")
+        _image_pipeline.cuda()
     if _image_pipeline is None:
         print("Loading TRELLIS image-to-3D pipeline...")
         _image_pipeline = TrellisImageTo3DPipeline.from_pretrained(
@@ -65,7 +108,7 @@ def load_image_pipeline():
 def clear_pipeline_cache():
     """
     Clear cached pipelines from GPU memory.
-    Moves pipelines to CPU and clears references to free GPU memory.
+    Moves pipelines to CPU and keeps them there, so the next load only copies weights back.
     """
     global _text_pipeline, _image_pipeline
     
@@ -73,6 +116,7 @@ def clear_pipeline_cache():
         if _text_pipeline is not None:
             try:
                 _text_pipeline.cpu()
+                _offloaded_pipelines["text"] = _text_pipeline
                 print("[MEMORY] Text pipeline moved to CPU")
             except Exception as e:
                 print(f"[MEMORY] Warning: Could not move text pipeline to CPU: {e}")
@@ -81,6 +125,7 @@ def clear_pipeline_cache():
         if _image_pipeline is not None:
             try:
                 _image_pipeline.cpu()
+                _offloaded_pipelines["image"] = _image_pipeline
                 print("[MEMORY] Image pipeline moved to CPU")
             except Exception as e:
                 print(f"[MEMORY] Warning: Could not move image pipeline to CPU: {e}")
@@ -88,11 +133,42 @@ def clear_pipeline_cache():
         
         # Clear CUDA cache
         torch.cuda.empty_cache()
-        torch.cuda.synchronize()
         
         print("[MEMORY] Pipeline cache cleared")
 
-def sample(out_folder, text=None, image=None, seed=1, mesh=True, rf=False, no_slat=False, save_video=False, n_samples=1):
+def _write_and_precompress(write_fn, path):
+    """
+    Write an output with write_fn(path), then its gzip sibling.
+    Runs on io_pool, so the sibling is compressed inline and is joined with the other writes.
+    A failed compression is reported but not fatal: the uncompressed file is served instead.
+    """
+    write_fn(path)
+    try:
+        write_gzip_sibling(path)
+    except Exception as e:
+        print(f"[GENERATE] Warning: Could not precompress {path}: {e}")
+
+def _mesh_to_numpy(mesh):
+    """
+    Copy mesh vertices and faces to host memory with a single device synchronization.
+    Both copies are queued asynchronously into pinned buffers on the current stream.
+    
+    Args:
+        mesh: Mesh output with 'vertices' and 'faces' tensors
+    
+    Returns:
+        Tuple of (vertices, faces) numpy arrays
+    """
+    if not mesh.vertices.is_cuda:
+        return mesh.vertices.numpy(), mesh.faces.numpy()
+    vertices = torch.empty(mesh.vertices.shape, dtype=mesh.vertices.dtype, pin_memory=True)
+    faces = torch.empty(mesh.faces.shape, dtype=mesh.faces.dtype, pin_memory=True)
+    vertices.copy_(mesh.vertices, non_blocking=True)
+    faces.copy_(mesh.faces, non_blocking=True)
+    torch.cuda.current_stream().synchronize()
+    return vertices.numpy(), faces.numpy()
+
+def sample(out_folder, text=None, image=None, seed=1, mesh=True, rf=False, no_slat=False, save_video=False, n_samples=1, texture_size=1024):
     """
     Run sampling as a function, based on trellis-physics-studio/source/sample.py.
     This function saves all relevant data for downstream tasks including SLAT files.
@@ -107,6 +183,7 @@ def sample(out_folder, text=None, image=None, seed=1, mesh=True, rf=False, no_sl
         no_slat: If True, skip SLAT file generation (default: False - always save SLAT for downstream tasks)
         save_video: Whether to save video renders
         n_samples: Number of samples to generate
+        texture_size: Resolution of the baked GLB texture (lower is faster to bake)
     
     Returns:
         Dictionary with file paths and metadata
@@ -154,13 +231,22 @@ def sample(out_folder, text=None, image=None, seed=1, mesh=True, rf=False, no_sl
         # If it's an image, copy it. If it's a text, write it.
         if image:
             _, ext_image = os.path.splitext(image)
-            shutil.copy(image, os.path.join(out_folder, "image" + ext_image))
+            image_copy = os.path.join(out_folder, "image" + ext_image)
+            if os.path.abspath(image) != os.path.abspath(image_copy):
+                # Hardlink when possible (same filesystem) to avoid rewriting the bytes
+                try:
+                    os.link(image, image_copy)
+                except OSError:
+                    shutil.copy(image, image_copy)
         else:
             # Save text prompt
             with open(os.path.join(out_folder, "prompt.txt"), "w") as f:
                 f.write(text)
 
         saved_files = {}
+        # File writes run on io_pool while the next GPU stage proceeds; joined before returning
+        pending_writes = []
+        glb_exports = []
         
         for i_sample in range(n_samples):
             sample_files = {}
@@ -169,30 +255,28 @@ def sample(out_folder, text=None, image=None, seed=1, mesh=True, rf=False, no_sl
             if save_video:
                 video = render_utils.render_video(outputs["gaussian"][i_sample])["color"]
                 video_path = os.path.join(out_folder, f"sample_gs_{i_sample:02d}.mp4")
-                imageio.mimsave(video_path, video, fps=30)
+                pending_writes.append(io_pool.submit(imageio.mimsave, video_path, video, fps=30))
                 sample_files["gaussian_video"] = video_path
                 
             if rf:
                 if save_video:
                     video = render_utils.render_video(outputs["radiance_field"][i_sample])["color"]
                     video_path = os.path.join(out_folder, f"sample_rf_{i_sample:02d}.mp4")
-                    imageio.mimsave(video_path, video, fps=30)
+                    pending_writes.append(io_pool.submit(imageio.mimsave, video_path, video, fps=30))
                     sample_files["radiance_field_video"] = video_path
                     
             if mesh:
                 if save_video:
                     video = render_utils.render_video(outputs["mesh"][i_sample])["normal"]
                     video_path = os.path.join(out_folder, f"sample_mesh_{i_sample:02d}.mp4")
-                    imageio.mimsave(video_path, video, fps=30)
+                    pending_writes.append(io_pool.submit(imageio.mimsave, video_path, video, fps=30))
                     sample_files["mesh_video"] = video_path
 
                 # Export OBJ file
-                mesh_obj = trimesh.Trimesh(
-                    vertices=outputs["mesh"][i_sample].vertices.cpu().numpy(),
-                    faces=outputs["mesh"][i_sample].faces.cpu().numpy(),
-                )
+                vertices_np, faces_np = _mesh_to_numpy(outputs["mesh"][i_sample])
+                mesh_obj = trimesh.Trimesh(vertices=vertices_np, faces=faces_np)
                 obj_path = os.path.join(out_folder, f"sample_{i_sample:02d}.obj")
-                mesh_obj.export(obj_path)
+                pending_writes.append(io_pool.submit(_write_and_precompress, mesh_obj.export, obj_path))
                 sample_files["mesh_obj"] = obj_path
 
                 # GLB files can be extracted from the outputs
@@ -202,18 +286,18 @@ def sample(out_folder, text=None, image=None, seed=1, mesh=True, rf=False, no_sl
                         outputs["mesh"][i_sample],
                         # Optional parameters
                         simplify=0.95,  # Ratio of triangles to remove in the simplification process
-                        texture_size=1024,  # Size of the texture used for the GLB
+                        texture_size=texture_size,  # Size of the texture used for the GLB
                         y_up=False,
                     )
                     glb_path = os.path.join(out_folder, f"sample_{i_sample:02d}.glb")
-                    glb.export(glb_path)
+                    glb_exports.append((io_pool.submit(glb.export, glb_path), sample_files))
                     sample_files["mesh_glb"] = glb_path
                 except Exception as e:
                     print(f"Failed to export GLB file: {e}")
 
             # Save Gaussians as PLY files
             ply_path = os.path.join(out_folder, f"sample_{i_sample:02d}.ply")
-            outputs["gaussian"][i_sample].save_ply(ply_path)
+            pending_writes.append(io_pool.submit(_write_and_precompress, outputs["gaussian"][i_sample].save_ply, ply_path))
             sample_files["gaussian_ply"] = ply_path
 
             # Save SLAT files for downstream physics tasks (critical for physics optimization)
@@ -223,11 +307,19 @@ def sample(out_folder, text=None, image=None, seed=1, mesh=True, rf=False, no_sl
                 neg_cond: torch.Tensor = outputs["neg_cond"]
                 z_s: torch.Tensor = outputs["z_s"][i_sample]
                 slat_path = os.path.join(out_folder, f"slat_{i_sample:02d}.pt")
-                save_slat_conds(slat_path, slat, cond, neg_cond, z_s)
+                pending_writes.append(io_pool.submit(save_slat_conds, slat_path, slat, cond, neg_cond, z_s))
                 sample_files["slat"] = slat_path
             
             saved_files[f"sample_{i_sample:02d}"] = sample_files
         
+        # Wait for all writes; a failed GLB export is non-fatal, anything else propagates
+        for glb_future, sample_files in glb_exports:
+            if glb_future.exception() is not None:
+                print(f"Failed to export GLB file: {glb_future.exception()}")
+                sample_files.pop("mesh_glb", None)
+        for future in pending_writes:
+            future.result()
+        
         return {
             "output_folder": out_folder,
             "samples": saved_files,
@@ -242,7 +334,8 @@ def generate_3d_from_image(
     output_folder: str,
     seed: int = 1,
     num_samples: int = 1,
-    save_video: bool = False
+    save_video: bool = False,
+    texture_size: int = 1024
 ) -> Dict[str, Any]:
     """
     Generate 3D models from an image using TRELLIS
@@ -254,6 +347,7 @@ def generate_3d_from_image(
         seed: Random seed for generation
         num_samples: Number of samples to generate
         save_video: Whether to save video renders
+        texture_size: Resolution of the baked GLB texture
     
     Returns:
         Dictionary containing generated file paths and metadata
@@ -270,7 +364,8 @@ def generate_3d_from_image(
             rf=False,
             no_slat=False,  # Always save SLAT for downstream tasks
             save_video=save_video,
-            n_samples=num_samples
+            n_samples=num_samples,
+            texture_size=texture_size
         )
         
         # For compatibility with existing API, also return GLB path from first sample
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Generation Cache Module
+Maps the inputs of a /generate request to the response of a previous identical run
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Bump when the generation pipeline (models, sampler settings, output layout) changes,
+# so responses produced by an older pipeline are no longer served as cache hits
+PIPELINE_VERSION = "trellis-image-large/1"
+
+
+def make_cache_key(prompt: str, seed: int, image_digests: List[str], texture_size: int = 1024) -> str:
+    """
+    Build the cache key for a generation request.
+
+    Args:
+        prompt: Text prompt
+        seed: Generation seed
+        image_digests: Hex SHA-256 digests of the uploaded images, in upload order
+        texture_size: GLB texture resolution requested
+
+    Returns:
+        Hex SHA-256 digest identifying the request inputs
+    """
+    h = hashlib.sha256()
+    h.update(PIPELINE_VERSION.encode("ascii"))
+    h.update(b"\0")
+    h.update(prompt.encode("utf-8"))
+    h.update(b"\0")
+    h.update(f"{seed}:{texture_size}".encode("ascii"))
+    for digest in image_digests:
+        h.update(b"\0")
+        h.update(digest.encode("ascii"))
+    return h.hexdigest()
+
+
+class GenerationCache:
+    """
+    SQLite-backed map of cache key -> (generation_id, response).
+    SQLite keeps entries consistent across uvicorn reload workers sharing the file.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS generations ("
+            "key TEXT PRIMARY KEY, generation_id TEXT NOT NULL, "
+            "response TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached entry {'generation_id', 'response'} for key, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT generation_id, response FROM generations WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"generation_id": row[0], "response": json.loads(row[1])}
+
+    def put(self, key: str, generation_id: str, response: Dict[str, Any]) -> None:
+        """Store the response produced for key"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO generations VALUES (?, ?, ?, ?)",
+                (key, generation_id, json.dumps(response), time.time()),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        """Drop the entry for key (e.g. when its generation folder no longer exists)"""
+        with self._lock:
+            self._conn.execute("DELETE FROM generations WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Close the underlying database connection"""
+        with self._lock:
+            self._conn.close()
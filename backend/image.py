@@ -1,31 +1,38 @@
 import os
+import asyncio
+import functools
 from typing import List
-import fal_client
-from fal_client import SyncClient
+from fal_client import AsyncClient
 
-os.environ["FAL_KEY"] = "2502d69c-9c06-492a-9ef4-f081219e24ad:d46abb10980cb7048ae878f08606cac4"
 
-def _ensure_image_urls(image_input: List[str]) -> List[str]:
+@functools.lru_cache(maxsize=None)
+def _get_client() -> AsyncClient:
+    """Create the fal client once, on first use; requires FAL_KEY in the environment."""
+    if not os.environ.get("FAL_KEY"):
+        raise RuntimeError("FAL_KEY environment variable is not set (required for image generation).")
+    return AsyncClient()
+
+
+async def _ensure_image_urls(image_input: List[str]) -> List[str]:
     """
     fal model inputs want public URLs (or data URIs). If you pass local file paths,
     upload them to fal storage and use the returned URLs.
+    Uploads run concurrently; the returned URLs keep the input order.
     """
-    client = SyncClient()  # uses FAL_KEY from env by default
-    urls: List[str] = []
+    client = _get_client()
 
-    for item in image_input:
+    async def to_url(item: str) -> str:
         if item.startswith(("http://", "https://", "data:")):
-            urls.append(item)
-        else:
-            # Treat as local path -> upload to fal CDN
-            urls.append(client.upload_file(item))
+            return item
+        # Treat as local path -> upload to fal CDN
+        return await client.upload_file(item)
 
-    return urls
+    return list(await asyncio.gather(*(to_url(item) for item in image_input)))
 
-def generate_image(prompt: str, image_input: List[str]) -> str:
-    image_urls = _ensure_image_urls(image_input)
+async def generate_image(prompt: str, image_input: List[str]) -> str:
+    image_urls = await _ensure_image_urls(image_input)
 
-    result = fal_client.subscribe(
+    result = await _get_client().subscribe(
         "fal-ai/nano-banana/edit",
         arguments={
             "prompt": "Generate only the following object without context: " + prompt,
@@ -6,18 +6,35 @@ Logs all backend terminal output for each session
 
 import os
 import sys
+import time
+import atexit
+import queue
 import logging
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
 
 
+# (epoch second, formatted timestamp) of the last log line; strftime runs at most once per second
+_TS_CACHE = [0, ""]
+
+
+def _timestamp() -> str:
+    """Return the current local time as 'YYYY-MM-DD HH:MM:SS', reformatted only when the second changes"""
+    now = int(time.time())
+    if now != _TS_CACHE[0]:
+        _TS_CACHE[1] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))
+        _TS_CACHE[0] = now
+    return _TS_CACHE[1]
+
+
 class TeeOutput:
     """Writes to both file and original stream"""
     
-    def __init__(self, original_stream, log_file, stream_name):
+    def __init__(self, original_stream, log_fh, stream_name):
         self.original_stream = original_stream
-        self.log_file = log_file
+        self.log_fh = log_fh
         self.stream_name = stream_name
     
     def write(self, text):
@@ -25,12 +42,9 @@ class TeeOutput:
         self.original_stream.write(text)
         self.original_stream.flush()
         
-        # Write to log file
+        # Hand the line to the session log's writer thread (formatting and disk I/O happen there)
         if text.strip():
-            with open(self.log_file, 'a', encoding='utf-8') as f:
-                timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                f.write(f"[{timestamp}] [{self.stream_name}] {text}")
-                f.flush()
+            self.log_fh.write(_timestamp(), self.stream_name, text)
     
     def flush(self):
         self.original_stream.flush()
@@ -51,6 +65,101 @@ class TeeOutput:
         return getattr(self.original_stream, 'seekable', lambda: False)()
 
 
+class _QueuedLogFile:
+    """
+    Session log file written by a single daemon thread.
+    Producers only enqueue (timestamp, stream name, text) or a preformatted log record
+    line; the writer batches entries until 64 KiB accumulate or 10 ms have passed since
+    the batch's first entry, then issues one os.write, so a steady stream of writes
+    cannot hold lines back.
+    """
+    
+    BATCH_BYTES = 1 << 16
+    BATCH_WAIT = 0.01
+    _CLOSE = object()
+    
+    def __init__(self, path):
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._queue = queue.Queue(maxsize=4096)
+        self._closed = False
+        self._thread = threading.Thread(target=self._drain, name="session-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    
+    def write(self, timestamp, stream_name, text):
+        if not self._closed:
+            self._queue.put((timestamp, stream_name, text))
+    
+    def write_line(self, line):
+        if not self._closed:
+            self._queue.put(line)
+    
+    def _drain(self):
+        batch = []
+        size = 0
+        deadline = 0.0
+        while True:
+            try:
+                timeout = max(deadline - time.monotonic(), 0.0) if batch else None
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            
+            if item is not None and item is not self._CLOSE:
+                line = item if isinstance(item, str) else "[%s] [%s] %s" % item
+                if not batch:
+                    deadline = time.monotonic() + self.BATCH_WAIT
+                batch.append(line)
+                size += len(line)
+                if size < self.BATCH_BYTES and time.monotonic() < deadline:
+                    continue
+            
+            if batch:
+                self._write_all("".join(batch).encode('utf-8', 'replace'))
+                batch = []
+                size = 0
+            
+            if item is self._CLOSE:
+                return
+    
+    def _write_all(self, data):
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self._fd, view):]
+        except OSError:
+            pass
+    
+    def close(self):
+        """Drain pending entries and close the file"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._CLOSE)
+        self._thread.join(timeout=5.0)
+        if self._thread.is_alive():
+            # The writer is stuck in os.write; closing now could let it write to a reused fd
+            sys.__stderr__.write(
+                "[LOGGER] Session log writer did not stop; leaving the log file open\n"
+            )
+            return
+        os.close(self._fd)
+
+
+class _QueuedLogHandler(logging.Handler):
+    """Logging handler that formats records and hands them to the session log's writer thread"""
+    
+    def __init__(self, log_file: _QueuedLogFile):
+        super().__init__()
+        self._log_file = log_file
+    
+    def emit(self, record):
+        try:
+            self._log_file.write_line(self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
+
+
 class SessionLogger:
     """
     Logger that creates a new log file for each session
@@ -90,8 +199,10 @@ class SessionLogger:
         self.logger.setLevel(logging.DEBUG)
         self.logger.handlers = []  # Clear existing handlers
         
-        # File handler - logs everything
-        file_handler = logging.FileHandler(self.log_file, mode='a', encoding='utf-8')
+        # File handler - logs everything. Records go through the same writer thread as the
+        # captured stdout/stderr, so they are batched, flushed within 10 ms and stay in order.
+        self._log_fh = _QueuedLogFile(self.log_file)
+        file_handler = _QueuedLogHandler(self._log_fh)
         file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(
             logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s', 
@@ -110,14 +221,14 @@ class SessionLogger:
             self.logger.info("--- worker restarted (same session) ---")
         else:
             self.logger.info("=" * 80)
-            self.logger.info(f"Session started: {self.session_id}")
-            self.logger.info(f"Log file: {self.log_file}")
+            self.logger.info("Session started: %s", self.session_id)
+            self.logger.info("Log file: %s", self.log_file)
             self.logger.info("=" * 80)
     
     def _redirect_streams(self):
         """Redirect stdout and stderr to both file and console"""
-        sys.stdout = TeeOutput(self.original_stdout, self.log_file, 'STDOUT')
-        sys.stderr = TeeOutput(self.original_stderr, self.log_file, 'STDERR')
+        sys.stdout = TeeOutput(self.original_stdout, self._log_fh, 'STDOUT')
+        sys.stderr = TeeOutput(self.original_stderr, self._log_fh, 'STDERR')
     
     def get_logger(self) -> logging.Logger:
         """Get the logger instance"""
@@ -128,12 +239,13 @@ class SessionLogger:
         return self.log_file
     
     def cleanup(self):
-        """Restore original streams and log session end"""
+        """Restore original streams, flush captured output and log session end"""
         sys.stdout = self.original_stdout
         sys.stderr = self.original_stderr
         self.logger.info("=" * 80)
-        self.logger.info(f"Session ended: {self.session_id}")
+        self.logger.info("Session ended: %s", self.session_id)
         self.logger.info("=" * 80)
+        self._log_fh.close()
 
 
 # Global session logger instance
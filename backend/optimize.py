@@ -8,10 +8,15 @@ Based on trellis-physics-studio/source/optimize.py
 import os
 import sys
 import gc
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, Any, Optional
 from plot_stresses import plot_hexahedral_mesh_surface_stylized
 
+# Child of the session 'backend' logger: shares its handlers without creating a session on import
+logger = logging.getLogger("backend.optimize")
+
 # Add TRELLIS to the path
 sys.path.append("/home/farazfaruqi/trellis-physics")
 
@@ -20,9 +25,6 @@ os.environ["SPCONV_ALGO"] = "native"
 # Use default attention backend from TRELLIS environment (flash-attn or xformers)
 # os.environ['ATTN_BACKEND'] = 'xformers'  # Uncomment to force xformers
 
-# Set PyTorch CUDA memory allocation config to reduce fragmentation
-os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True")
-
 import torch
 from trellis.utils import postprocessing_utils
 from trellis.modules.sparse.basic import SlatPayload
@@ -30,6 +32,14 @@ from trellis.physics.optimizer_factory import OptimizerFactory
 from trellis.physics.boundary import get_directional_boundary_conditions
 from trellis.utils.phys_utils import *
 from trellis.representations.mesh.cube2mesh import MeshExtractResult
+import numpy as np
+
+
+def _to_numpy(value):
+    """Return a host numpy copy of a tensor or array-like"""
+    if torch.is_tensor(value):
+        return value.detach().cpu().numpy()
+    return np.asarray(value)
 
 
 def clear_cuda_memory(aggressive=False):
@@ -41,39 +51,34 @@ def clear_cuda_memory(aggressive=False):
         aggressive: If True, perform more aggressive memory clearing including
                     resetting PyTorch's memory pool
     """
-    print("[MEMORY] Clearing CUDA memory...")
+    logger.debug("[MEMORY] Clearing CUDA memory...")
     
     if torch.cuda.is_available():
         # Get memory stats before clearing
         allocated_before = torch.cuda.memory_allocated() / 1024**3  # GB
         reserved_before = torch.cuda.memory_reserved() / 1024**3  # GB
         
-        print(f"[MEMORY] Before clearing - Allocated: {allocated_before:.2f} GB, Reserved: {reserved_before:.2f} GB")
+        logger.debug("[MEMORY] Before clearing - Allocated: %.2f GB, Reserved: %.2f GB", allocated_before, reserved_before)
         
         # Clear cached pipelines from GPU memory
         try:
             from generate import clear_pipeline_cache
             clear_pipeline_cache()
         except Exception as e:
-            print(f"[MEMORY] Note: Could not clear pipeline cache: {e}")
+            logger.debug("[MEMORY] Note: Could not clear pipeline cache: %s", e)
             # Continue anyway - we'll still clear CUDA cache
         
-        # Run garbage collection multiple times for thorough cleanup
-        for i in range(3):
-            gc.collect()
+        # A single full collection releases unreachable tensors; repeated passes find nothing new
+        gc.collect()
         
         # Clear CUDA cache
         torch.cuda.empty_cache()
-        torch.cuda.synchronize()
         
         # Aggressive memory clearing
         if aggressive:
-            print("[MEMORY] Performing aggressive memory clearing...")
-            # Reset PyTorch's memory pool
-            torch.cuda.empty_cache()
+            logger.debug("[MEMORY] Performing aggressive memory clearing...")
+            # Release CUDA IPC handles held for other processes
             torch.cuda.ipc_collect()
-            torch.cuda.synchronize()
-            gc.collect()
             
             # Try to reset memory stats if possible
             if hasattr(torch.cuda, 'reset_peak_memory_stats'):
@@ -84,15 +89,15 @@ def clear_cuda_memory(aggressive=False):
         reserved_after = torch.cuda.memory_reserved() / 1024**3  # GB
         
         freed = (allocated_before - allocated_after)
-        print(f"[MEMORY] After clearing - Allocated: {allocated_after:.2f} GB, Reserved: {reserved_after:.2f} GB")
-        print(f"[MEMORY] Freed: {freed:.2f} GB")
+        logger.debug("[MEMORY] After clearing - Allocated: %.2f GB, Reserved: %.2f GB", allocated_after, reserved_after)
+        logger.debug("[MEMORY] Freed: %.2f GB", freed)
         
         # Warn if memory is still high
         if reserved_after > 1.0:
-            print(f"[MEMORY] WARNING: Reserved memory is still high ({reserved_after:.2f} GB). "
-                  "This may cause OOM during optimization.")
+            logger.warning("[MEMORY] Reserved memory is still high (%.2f GB). "
+                           "This may cause OOM during optimization.", reserved_after)
     else:
-        print("[MEMORY] CUDA not available, skipping memory clearing")
+        logger.debug("[MEMORY] CUDA not available, skipping memory clearing")
 
 
 def optimize_model(
@@ -116,7 +121,7 @@ def optimize_model(
     if not slat_file.exists():
         raise FileNotFoundError(f"SLAT file not found: {slat_file}")
     
-    print(f"[OPTIMIZE] Starting physics optimization for: {folder}")
+    logger.info("[OPTIMIZE] Starting physics optimization for: %s", folder)
     
     # Clear CUDA memory aggressively before optimization to avoid OOM errors
     clear_cuda_memory(aggressive=True)
@@ -124,11 +129,11 @@ def optimize_model(
     try:
         # 1. Load SLAT payload
         slat = SlatPayload.from_path(str(slat_file))
-        print("[OPTIMIZE] SLAT payload loaded successfully")
+        logger.debug("[OPTIMIZE] SLAT payload loaded successfully")
         
         # 2. Create OptimizerFactory
         optimizer_factory = OptimizerFactory(slat)
-        print("[OPTIMIZE] Optimizer factory initiated")
+        logger.debug("[OPTIMIZE] Optimizer factory initiated")
         
         # 3. Get simulation voxels and set boundary conditions
         coarse_coords, nodes, elements = optimizer_factory.get_simulation_voxels()
@@ -138,18 +143,18 @@ def optimize_model(
             nodes, direction="bottom_z", threshold=0.05
         )
         optimizer_factory.set_boundary_conditions(bottom_boundary_conditions)
-        print("[OPTIMIZE] Boundary conditions set (bottom support)")
+        logger.debug("[OPTIMIZE] Boundary conditions set (bottom support)")
         
         # 4. Create optimizer
         optimizer = optimizer_factory.create_optimizer()
-        print(f"[OPTIMIZE] Optimizer created. Coords shape: {slat.slat.coords.shape}")
-        print(f"[OPTIMIZE] Sparse coords shape: {optimizer.current_trajectory.states[0].coarse_coords.shape}")
+        logger.debug("[OPTIMIZE] Optimizer created. Coords shape: %s", slat.slat.coords.shape)
+        logger.debug("[OPTIMIZE] Sparse coords shape: %s", optimizer.current_trajectory.states[0].coarse_coords.shape)
         
         # Final memory clear before optimization starts (after optimizer creation)
         if torch.cuda.is_available():
             allocated_before_opt = torch.cuda.memory_allocated() / 1024**3
             reserved_before_opt = torch.cuda.memory_reserved() / 1024**3
-            print(f"[MEMORY] Before optimization - Allocated: {allocated_before_opt:.2f} GB, Reserved: {reserved_before_opt:.2f} GB")
+            logger.debug("[MEMORY] Before optimization - Allocated: %.2f GB, Reserved: %.2f GB", allocated_before_opt, reserved_before_opt)
             
             # Clear any remaining cached memory
             gc.collect()
@@ -158,69 +163,82 @@ def optimize_model(
             
             allocated_after_opt = torch.cuda.memory_allocated() / 1024**3
             reserved_after_opt = torch.cuda.memory_reserved() / 1024**3
-            print(f"[MEMORY] After final clear - Allocated: {allocated_after_opt:.2f} GB, Reserved: {reserved_after_opt:.2f} GB")
+            logger.debug("[MEMORY] After final clear - Allocated: %.2f GB, Reserved: %.2f GB", allocated_after_opt, reserved_after_opt)
         
         # 5. Run optimization
-        print("[OPTIMIZE] Running physics optimization...")
+        logger.info("[OPTIMIZE] Running physics optimization...")
         try:
             optimizer.optimize()
-            print("[OPTIMIZE] Optimization completed successfully")
+            logger.info("[OPTIMIZE] Optimization completed successfully")
         except RuntimeError as e:
-            print(f"[OPTIMIZE] Optimization failed: {e}")
+            logger.error("[OPTIMIZE] Optimization failed: %s", e)
             raise RuntimeError(f"Physics optimization failed: {str(e)}")
         
         # 6. Save optimizer states as .pt (optional)
         if save_slat:
             slat_dest = folder / "slat_optim_states.pt"
             torch.save({"optimizer_states": optimizer.current_trajectory.states}, str(slat_dest))
-            print(f"[OPTIMIZE] Optimizer states saved to: {slat_dest}")
-        
-        # 7. Save optimized GLB
-        print("[OPTIMIZE] Exporting optimized GLB file...")
-        glb_path = folder / "sample_optimized.glb"
-        
-        glb = postprocessing_utils.to_glb(
-            optimizer.current_trajectory.states[-1].splats.to(device="cuda"),
-            MeshExtractResult(
-                torch.tensor(optimizer.current_trajectory.states[-1].mesh_vertices),
-                torch.tensor(optimizer.current_trajectory.states[-1].mesh_faces)
-            ),
-            simplify=0.95,
-            texture_size=1024,
-            y_up=False,
-        )
+            logger.info("[OPTIMIZE] Optimizer states saved to: %s", slat_dest)
         
-        glb.export(str(glb_path))
-        print(f"[OPTIMIZE] Optimized GLB saved to: {glb_path}")
-
-        #8. Plot stresses
-        initial_mises = optimizer.current_trajectory.states[0].mises
-        initial_nodes = optimizer.current_trajectory.states[0].nodes
-        initial_elements = optimizer.current_trajectory.states[0].elements
-
-        plot_hexahedral_mesh_surface_stylized(
-            initial_elements,
-            initial_nodes,
-            initial_mises,
-            folder_path,
-            optimized=False,
-            normalize=False
+        # 7. Plot stresses in the background while the GLB is baked on the GPU.
+        # Snapshot the plotted states to host numpy first so the plotting thread never touches CUDA.
+        initial_state = optimizer.current_trajectory.states[0]
+        optimized_state = optimizer.current_trajectory.states[-1]
+        initial_plot_args = (
+            _to_numpy(initial_state.elements),
+            _to_numpy(initial_state.nodes),
+            _to_numpy(initial_state.mises),
         )
-
-        optimized_mises = optimizer.current_trajectory.states[-1].mises
-        optimized_nodes = optimizer.current_trajectory.states[-1].nodes
-        optimized_elements = optimizer.current_trajectory.states[-1].elements
-
-        plot_hexahedral_mesh_surface_stylized(
-            optimized_elements,
-            optimized_nodes,
-            optimized_mises,
-            folder_path,
-            optimized=True,
-            normalize=False
+        optimized_plot_args = (
+            _to_numpy(optimized_state.elements),
+            _to_numpy(optimized_state.nodes),
+            _to_numpy(optimized_state.mises),
         )
-        
-        print("[OPTIMIZE] Stresses plotted successfully")
+
+        # Only the final state is needed from here on (for the GLB); release the rest of the trajectory
+        del initial_state
+        optimizer.current_trajectory.states = None
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+        # A single plotting thread: matplotlib figures are not safe to build concurrently
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="optimize-plot") as plot_pool:
+            plot_futures = [
+                plot_pool.submit(
+                    plot_hexahedral_mesh_surface_stylized,
+                    *initial_plot_args, folder_path, optimized=False, normalize=False
+                ),
+                plot_pool.submit(
+                    plot_hexahedral_mesh_surface_stylized,
+                    *optimized_plot_args, folder_path, optimized=True, normalize=False
+                ),
+            ]
+
+            # 8. Save optimized GLB
+            logger.debug("[OPTIMIZE] Exporting optimized GLB file...")
+            glb_path = folder / "sample_optimized.glb"
+
+            glb = postprocessing_utils.to_glb(
+                optimized_state.splats.to(device="cuda"),
+                # as_tensor reuses existing tensors instead of copying them
+                MeshExtractResult(
+                    torch.as_tensor(optimized_state.mesh_vertices),
+                    torch.as_tensor(optimized_state.mesh_faces)
+                ),
+                simplify=0.95,
+                texture_size=1024,
+                y_up=False,
+            )
+
+            glb.export(str(glb_path))
+            logger.info("[OPTIMIZE] Optimized GLB saved to: %s", glb_path)
+            del glb, optimized_state
+
+            for future in plot_futures:
+                future.result()
+
+        logger.debug("[OPTIMIZE] Stresses plotted successfully")
         
         # Clean up optimizer and intermediate variables to free memory
         del optimizer
@@ -238,9 +256,7 @@ def optimize_model(
         }
         
     except Exception as e:
-        print(f"[OPTIMIZE] Error during optimization: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("[OPTIMIZE] Error during optimization: %s", e)
         return {
             "success": False,
             "error": str(e),
@@ -1,8 +1,37 @@
 import numpy as np
-import matplotlib.pyplot as plt
+import matplotlib
+matplotlib.use("Agg")  # headless: plots are rendered from worker threads, never shown
 import os
+from matplotlib import cm, colors
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from mpl_toolkits.mplot3d.art3d import Poly3DCollection
 
+# Node indices of the 6 quad faces of a hexahedral element
+HEX_FACES = np.array([
+    [0, 1, 2, 3], [4, 5, 6, 7],
+    [0, 1, 5, 4], [1, 2, 6, 5],
+    [2, 3, 7, 6], [3, 0, 4, 7],
+])
+
+def _surface_face_mask(all_faces, num_nodes):
+    """
+    Boolean mask over the (K, 4) face quads selecting faces that occur exactly once.
+    Meshes with fewer than 2**16 nodes pack each sorted quad into one uint64 key, so the
+    unique pass is a scalar sort instead of the much slower row-wise unique(axis=0).
+    """
+    keys = np.sort(all_faces, axis=1)
+
+    if num_nodes <= 1 << 16:
+        keys = keys.astype(np.uint64)
+        packed = (keys[:, 0] << 48) | (keys[:, 1] << 32) | (keys[:, 2] << 16) | keys[:, 3]
+        _, inverse, counts = np.unique(packed, return_inverse=True, return_counts=True)
+    else:
+        _, inverse, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+
+    return counts[inverse.reshape(-1)] == 1
+
+
 def plot_hexahedral_mesh_surface_stylized(
     elements,
     nodes,
@@ -15,52 +44,45 @@ def plot_hexahedral_mesh_surface_stylized(
 ):
     """
     Stylized surface visualization of a hexahedral mesh with stress values.
+    Only exterior faces (not shared by two elements) are drawn, colored by their element's value.
 
     normalize: If True (default), clamp values to [0, 1] and use vmin=0, vmax=1.
                If False, use raw values and data-derived vmin/vmax for the colormap.
     """
 
-    hex_faces = [
-        [0, 1, 2, 3], [4, 5, 6, 7],
-        [0, 1, 5, 4], [1, 2, 6, 5],
-        [2, 3, 7, 6], [3, 0, 4, 7],
-    ]
-
-    fig = plt.figure(figsize=(12, 10))
-    ax = fig.add_subplot(111, projection='3d')
-
-    face_verts = []
-    face_colors = []
-    seen_faces = set()
+    elements = np.asarray(elements)
+    nodes = np.asarray(nodes)
+    values = np.asarray(values)
 
-    for elem_idx, elem in enumerate(elements):
-        val = values[elem_idx]
-        norm_val = min(val, 1.0) if normalize else val
+    # All 6 faces of every hex as node-id quads: (N*6, 4)
+    all_faces = elements[:, HEX_FACES].reshape(-1, 4)
+    elem_of_face = np.repeat(np.arange(len(elements)), len(HEX_FACES))
 
-        for face in hex_faces:
-            face_nodes = tuple(sorted([elem[i] for i in face]))
+    # Faces shared by two elements are interior; keep only those that occur once
+    surface = _surface_face_mask(all_faces, len(nodes))
 
-            if face_nodes in seen_faces:
-                continue
-            seen_faces.add(face_nodes)
+    face_verts = nodes[all_faces[surface]]  # (M, 4, 3)
+    face_vals = values[elem_of_face[surface]]
+    face_colors = np.minimum(face_vals, 1.0) if normalize else face_vals
 
-            verts = [nodes[elem[i]] for i in face]
-            face_verts.append(verts)
-            face_colors.append(norm_val)
+    # Object-oriented API (no pyplot global state); a fresh Figure per call keeps concurrent calls independent
+    fig = Figure(figsize=(12, 10))
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111, projection='3d')
 
     # Colormap
     if normalize:
         vmin, vmax = 0.0, 1.0
         cbar_label = "Stress / Max Stress"
     else:
-        face_arr = np.asarray(face_colors)
-        vmin, vmax = float(face_arr.min()), float(face_arr.max())
+        vmin, vmax = float(face_colors.min()), float(face_colors.max())
         if vmin == vmax:
             vmax = vmin + 1.0
         cbar_label = "Stress (raw)"
-    norm = plt.Normalize(vmin=vmin, vmax=vmax)
-    colormap = plt.cm.get_cmap(cmap)
-    color_mapped = colormap(norm(face_colors))
+    norm = colors.Normalize(vmin=vmin, vmax=vmax)
+    # One mappable maps the face values to RGBA and also backs the colorbar
+    mappable = cm.ScalarMappable(cmap=matplotlib.colormaps[cmap], norm=norm)
+    color_mapped = mappable.to_rgba(np.asarray(face_colors, dtype=np.float32))
 
     # Plot stylized mesh
     collection = Poly3DCollection(
@@ -80,11 +102,9 @@ def plot_hexahedral_mesh_surface_stylized(
     ax.set_xlabel("X")
     ax.set_ylabel("Y")
     ax.set_zlabel("Z")
-    plt.title(f"Stress Visualization {'Optimized' if optimized else 'Initial'}")
+    ax.set_title(f"Stress Visualization {'Optimized' if optimized else 'Initial'}")
 
     # Colorbar
-    mappable = plt.cm.ScalarMappable(cmap=colormap, norm=norm)
-    mappable.set_array([])
-    plt.colorbar(mappable, ax=ax, shrink=0.6, pad=0.1, label=cbar_label)
+    fig.colorbar(mappable, ax=ax, shrink=0.6, pad=0.1, label=cbar_label)
 
-    plt.savefig(os.path.join(folder_path, "stresses_optimized.png" if optimized else "stresses.png"))
\ No newline at end of file
+    canvas.print_png(os.path.join(folder_path, "stresses_optimized.png" if optimized else "stresses.png"))
\ No newline at end of file
@@ -6,10 +6,11 @@ Handles all segmentation-related functionality
 
 import sys
 import os
+import functools
 import numpy as np
 import torch
 import trimesh
-from scipy.spatial.distance import cdist
+from scipy.spatial import cKDTree
 from pathlib import Path
 
 # Add Point-SAM to the path
@@ -21,6 +22,45 @@ POINT_SAM_AVAILABLE = False
 point_sam_model = None
 current_ply_data = None
 
+# Initial number of click prompts preallocated on the GPU (grows geometrically)
+PROMPT_CAPACITY = 16
+_segmentation_stream = None
+
+
+def _loaded_cloud_key():
+    """Key of the cloud currently loaded for segmentation (model id, GLB mtime), or None"""
+    return current_ply_data['cloud_key'] if current_ply_data else None
+
+
+def _memoize_pointcloud_encoder(model, cloud_key):
+    """
+    Cache the point-cloud encoder output of a Point-SAM model across clicks.
+    
+    predict_masks re-encodes the (unchanged) cloud on every call; only the prompts differ.
+    The encoder forward is wrapped to return the previous result while cloud_key() still
+    names the same loaded cloud. Tensor identity and version counters are not used: the
+    inputs may be recreated per call or be inference tensors, which have no version counter.
+    """
+    encoder = getattr(model, 'pc_encoder', None)
+    if encoder is None:
+        return
+    
+    encode = encoder.forward
+    cache = {}
+    
+    def forward(coords, feats, *args, **kwargs):
+        key = cloud_key()
+        if args or kwargs or key is None:
+            return encode(coords, feats, *args, **kwargs)
+        if cache.get('key') == key:
+            return cache['output']
+        output = encode(coords, feats)
+        cache.update(key=key, output=output)
+        return output
+    
+    encoder.forward = forward
+
+
 try:
     from pc_sam.model.pc_sam import PointCloudSAM
     from pc_sam.utils.torch_utils import replace_with_fused_layernorm
@@ -49,6 +89,7 @@ try:
             load_model(model, checkpoint_path)
             model.eval()
             model.cuda()
+            _memoize_pointcloud_encoder(model, _loaded_cloud_key)
             
             return model
     
@@ -68,52 +109,71 @@ except Exception as e:
 def load_glb_for_point_sam(glb_path, num_samples=10000):
     """Load GLB file and prepare it for Point-SAM"""
     try:
-        mesh = trimesh.load(glb_path)
-        
-        # Handle Scene vs Mesh
-        if hasattr(mesh, 'geometry'):
-            meshes = []
-            for geom in mesh.geometry.values():
-                if hasattr(geom, 'vertices') and hasattr(geom, 'faces'):
-                    meshes.append(geom)
-            
-            if not meshes:
-                raise ValueError("No valid mesh geometry found in GLB file")
-            
-            if len(meshes) == 1:
-                mesh = meshes[0]
-            else:
-                mesh = trimesh.util.concatenate(meshes)
+        mtime_ns = os.stat(glb_path).st_mtime_ns
+        return _load_glb_cached(str(glb_path), mtime_ns, num_samples)
+    except Exception as e:
+        return None, None, None, None
+
+
+@functools.lru_cache(maxsize=8)
+def _load_glb_cached(glb_path, mtime_ns, num_samples):
+    """
+    Sample and normalize a GLB for Point-SAM; memoized per (path, mtime, num_samples).
+    Returned arrays are read-only since they are shared between callers.
+    """
+    mesh = trimesh.load(glb_path)
+    
+    # Handle Scene vs Mesh
+    if hasattr(mesh, 'geometry'):
+        meshes = []
+        for geom in mesh.geometry.values():
+            if hasattr(geom, 'vertices') and hasattr(geom, 'faces'):
+                meshes.append(geom)
         
-        # Sample points from mesh surface
-        points, face_indices = mesh.sample(num_samples, return_index=True)
+        if not meshes:
+            raise ValueError("No valid mesh geometry found in GLB file")
         
-        # Extract colors if available
-        if hasattr(mesh.visual, 'face_colors') and mesh.visual.face_colors is not None:
-            colors = mesh.visual.face_colors[face_indices][:, :3]
-        elif hasattr(mesh.visual, 'vertex_colors') and mesh.visual.vertex_colors is not None:
-            distances = cdist(points, mesh.vertices)
-            nearest_vertex_indices = np.argmin(distances, axis=1)
-            colors = mesh.visual.vertex_colors[nearest_vertex_indices][:, :3]
+        if len(meshes) == 1:
+            mesh = meshes[0]
         else:
-            colors = np.full((len(points), 3), 128.0)
-        
-        # Normalize colors to [0,1] range if needed
-        if colors.max() > 1.0:
-            colors = colors / 255.0
-        
-        # Apply Point-SAM normalization
-        xyz = points.astype(np.float32)
-        rgb = colors.astype(np.float32)
-        
-        shift = xyz.mean(0)
-        scale = np.linalg.norm(xyz - shift, axis=-1).max()
-        xyz_normalized = (xyz - shift) / scale
-        
-        return xyz_normalized.astype(np.float32), rgb.astype(np.float32), shift, scale
-            
-    except Exception as e:
-        return None, None, None, None
+            mesh = trimesh.util.concatenate(meshes)
+    
+    # Sample points from mesh surface
+    points, face_indices = mesh.sample(num_samples, return_index=True)
+    
+    # Extract colors if available (trimesh colors are uint8 RGBA; gather the sampled rows, then scale to [0,1] float32)
+    if hasattr(mesh.visual, 'face_colors') and mesh.visual.face_colors is not None:
+        rgb = mesh.visual.face_colors[face_indices, :3].astype(np.float32) / 255.0
+    elif hasattr(mesh.visual, 'vertex_colors') and mesh.visual.vertex_colors is not None:
+        # Nearest-vertex lookup via a KD-tree instead of a dense (samples x vertices) distance matrix
+        tree = cKDTree(np.asarray(mesh.vertices, dtype=np.float32))
+        _, nearest_vertex_indices = tree.query(points.astype(np.float32), k=1, workers=-1)
+        rgb = mesh.visual.vertex_colors[nearest_vertex_indices, :3].astype(np.float32) / 255.0
+    else:
+        rgb = np.full((len(points), 3), 128.0 / 255.0, dtype=np.float32)
+    
+    # Apply Point-SAM normalization, centering and scaling the float32 copy in place
+    xyz_normalized = points.astype(np.float32)
+    
+    shift = xyz_normalized.mean(0)
+    xyz_normalized -= shift
+    scale = np.sqrt(np.einsum('ij,ij->i', xyz_normalized, xyz_normalized).max())
+    xyz_normalized /= scale
+    
+    for arr in (xyz_normalized, rgb, shift):
+        arr.setflags(write=False)
+    
+    return xyz_normalized, rgb, shift, scale
+
+
+def _upload_pinned(arr):
+    """
+    Copy a float32 array to the GPU through a pinned staging buffer with a non-blocking DMA.
+    The array is copied into the staging buffer, so cached read-only arrays are never aliased.
+    """
+    staging = torch.empty(arr.shape, dtype=torch.float32, pin_memory=True)
+    staging.numpy()[...] = arr
+    return staging.to('cuda', non_blocking=True)
 
 
 def load_model_for_segmentation(model_dir, files_dir):
@@ -138,15 +198,16 @@ def load_model_for_segmentation(model_dir, files_dir):
         else:
             return None, f"GLB file not found for model {model_dir}"
     
-    # Load GLB
+    # Load GLB (mtime taken first, so a rewrite during loading yields a new key on the next load)
+    glb_mtime_ns = glb_path.stat().st_mtime_ns
     points_norm, colors_norm, shift, scale = load_glb_for_point_sam(str(glb_path))
     
     if points_norm is None or colors_norm is None:
         return None, "Failed to load GLB data"
     
     # Convert to PyTorch tensors
-    pc_xyz = torch.from_numpy(points_norm).cuda().float().unsqueeze(0)
-    pc_rgb = torch.from_numpy(colors_norm).cuda().float().unsqueeze(0)
+    pc_xyz = _upload_pinned(points_norm).unsqueeze(0)
+    pc_rgb = _upload_pinned(colors_norm).unsqueeze(0)
     
     # Store model data
     current_ply_data = {
@@ -156,20 +217,47 @@ def load_model_for_segmentation(model_dir, files_dir):
         'scale': scale,
         'model_id': model_dir,
         'glb_path': str(glb_path),
-        'prompts': [],
-        'labels': [],
+        'cloud_key': (model_dir, glb_mtime_ns),
+        'prompts_gpu': torch.empty((PROMPT_CAPACITY, 3), device='cuda', dtype=torch.float32),
+        'labels_gpu': torch.empty((PROMPT_CAPACITY,), device='cuda', dtype=torch.long),
+        'num_prompts': 0,
         'prompt_mask': None
     }
     
     return current_ply_data, None
 
 
+def _append_prompt(point, label):
+    """
+    Write a prompt into the preallocated GPU buffers, doubling their capacity on overflow.
+    
+    Returns:
+        Number of accumulated prompts
+    """
+    n = current_ply_data['num_prompts']
+    prompts_gpu = current_ply_data['prompts_gpu']
+    labels_gpu = current_ply_data['labels_gpu']
+    
+    if n == prompts_gpu.shape[0]:
+        capacity = 2 * n
+        grown_prompts = prompts_gpu.new_empty((capacity, 3))
+        grown_labels = labels_gpu.new_empty((capacity,))
+        grown_prompts[:n] = prompts_gpu
+        grown_labels[:n] = labels_gpu
+        current_ply_data['prompts_gpu'] = prompts_gpu = grown_prompts
+        current_ply_data['labels_gpu'] = labels_gpu = grown_labels
+    
+    prompts_gpu[n] = point[0]
+    labels_gpu[n] = label[0]
+    current_ply_data['num_prompts'] = n + 1
+    return n + 1
+
+
 def clear_prompts():
     """Clear accumulated prompts"""
     global current_ply_data
     if current_ply_data is not None:
-        current_ply_data['prompts'] = []
-        current_ply_data['labels'] = []
+        current_ply_data['num_prompts'] = 0
         current_ply_data['prompt_mask'] = None
 
 
@@ -188,9 +276,9 @@ def get_pointcloud_data():
         # Denormalize points
         pc_xyz_orig = pc_xyz_cpu * scale + shift
         
-        # Flatten for Three.js
-        positions = pc_xyz_orig.flatten().tolist()
-        colors = pc_rgb_cpu.flatten().tolist()
+        # Flatten for Three.js (kept as float32 arrays; ORJSONResponse serializes numpy natively)
+        positions = np.ascontiguousarray(pc_xyz_orig, dtype=np.float32).reshape(-1)
+        colors = np.ascontiguousarray(pc_rgb_cpu, dtype=np.float32).reshape(-1)
         
         return {
             "xyz": positions,
@@ -202,6 +290,14 @@ def get_pointcloud_data():
         return None, str(e)
 
 
+def _get_segmentation_stream():
+    """Dedicated CUDA stream for Point-SAM, so clicks can overlap with generation/optimization work"""
+    global _segmentation_stream
+    if _segmentation_stream is None:
+        _segmentation_stream = torch.cuda.Stream()
+    return _segmentation_stream
+
+
 def segment_with_click(click_point):
     """Perform segmentation with click point"""
     global current_ply_data
@@ -226,46 +322,50 @@ def segment_with_click(click_point):
         if 'x' in click_point and 'y' in click_point and 'z' in click_point:
             click_pos = np.array([click_point['x'], click_point['y'], click_point['z']])
             click_pos_norm = (click_pos - shift) / scale
-            prompt_point = click_pos_norm.reshape(1, 3)
+            new_point = torch.tensor(click_pos_norm.reshape(1, 3), device='cuda', dtype=torch.float32)
         else:
-            center_point = pc_xyz[0].mean(dim=0).cpu().numpy()
-            prompt_point = center_point.reshape(1, 3)
+            new_point = pc_xyz[0].mean(dim=0, keepdim=True)
+        new_label = torch.tensor([prompt_label], device='cuda', dtype=torch.long)
         
-        # Add to prompts list
-        current_ply_data['prompts'].append(prompt_point[0])
-        current_ply_data['labels'].append(prompt_label)
+        # Append to the prompts kept resident on the GPU
+        num_prompts = _append_prompt(new_point, new_label)
         
-        # Convert accumulated prompts to tensors
-        prompt_points = torch.from_numpy(np.array(current_ply_data['prompts'])).cuda().float().unsqueeze(0)
-        prompt_labels = torch.from_numpy(np.array(current_ply_data['labels'])).cuda().unsqueeze(0)
+        prompt_points = current_ply_data['prompts_gpu'][:num_prompts].unsqueeze(0)
+        prompt_labels = current_ply_data['labels_gpu'][:num_prompts].unsqueeze(0)
         
-        # Run Point-SAM prediction
-        with torch.no_grad():
+        # Run Point-SAM on the segmentation stream, ordered after the prompt writes queued above
+        stream = _get_segmentation_stream()
+        stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(stream), torch.inference_mode():
             masks, iou_preds = point_sam_model.predict_masks(
                 pc_xyz, pc_rgb, prompt_points, prompt_labels, 
                 current_ply_data['prompt_mask'], 
                 current_ply_data['prompt_mask'] is None
             )
+            
+            # Use mask with highest IOU
+            best_idx = torch.argmax(iou_preds[0])
+            prompt_mask = masks[0][best_idx].unsqueeze(0)
+            segment_mask = masks[0][best_idx] > 0
+            
+            # Select the segment on the GPU so only that subset is transferred to the host
+            segment_idx = torch.nonzero(segment_mask, as_tuple=False).squeeze(1)
+            segment_xyz = pc_xyz[0][segment_idx]
+            segment_rgb = pc_rgb[0][segment_idx]
+        stream.synchronize()
         
-        # Use mask with highest IOU
-        best_idx = torch.argmax(iou_preds[0])
-        current_ply_data['prompt_mask'] = masks[0][best_idx].unsqueeze(0)
-        segment_mask = masks[0][best_idx] > 0
+        current_ply_data['prompt_mask'] = prompt_mask
         iou_score = iou_preds[0][best_idx].item()
         
         # Convert mask to point indices
-        point_indices = torch.where(segment_mask)[0].cpu().numpy().tolist()
+        point_indices = segment_idx.cpu().numpy().tolist()
         
         if len(point_indices) <= 10:
             return None, f"Segment too small: only {len(point_indices)} points"
         
         # Get original coordinates for segmented points
-        pc_xyz_cpu = pc_xyz[0].cpu().numpy()
-        pc_rgb_cpu = pc_rgb[0].cpu().numpy()
-        
-        segment_points_norm = pc_xyz_cpu[point_indices]
-        segment_colors = pc_rgb_cpu[point_indices]
-        segment_points_orig = segment_points_norm * scale + shift
+        segment_points_orig = segment_xyz.cpu().numpy() * scale + shift
+        segment_colors = segment_rgb.cpu().numpy()
         
         segment_colors_255 = (segment_colors * 255).astype(np.uint8)
         
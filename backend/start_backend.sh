@@ -39,6 +39,9 @@ mkdir -p logs
 # One session ID per backend run — uvicorn reload workers inherit this and append to the same log
 export BACKEND_SESSION_ID="${BACKEND_SESSION_ID:-$(date +%Y%m%d_%H%M%S)}"
 
+# Development mode: auto-reload on code changes (set DEV=0 for a production-style run)
+export DEV="${DEV:-1}"
+
 # Synchronous CUDA errors: next run will show the real line that triggered the assert.
 # Remove or comment out after debugging if you want better GPU performance.
 export CUDA_LAUNCH_BLOCKING=1